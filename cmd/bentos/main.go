@@ -89,7 +89,6 @@ func cmdInit(posDir string) error {
 	}
 
 	_ = writeIfMissing(filepath.Join(posDir, "STATE", "gmail.json"), `{
-  "last_sync": "",
   "threads": [],
   "stats": {"unread": 0, "inbox_total": 0}
 }\n`)
@@ -99,7 +98,6 @@ func cmdInit(posDir string) error {
   "stats": {"count": 0}
 }\n`)
 	_ = writeIfMissing(filepath.Join(posDir, "STATE", "linear.json"), `{
-  "last_sync": "",
   "issues": [],
   "stats": {"count": 0}
 }\n`)
@@ -2,50 +2,16 @@
 
 import json
 import os
+import re
 import subprocess
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
-from typing import Any
-
-
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
-
-
-def parse_frontmatter(md_path: str) -> dict[str, Any]:
-	with open(md_path, 'r', encoding='utf-8') as f:
-		lines = f.read().splitlines()
-	if not lines or lines[0].strip() != '---':
-		return {}
-	data: dict[str, Any] = {}
-	i = 1
-	current_list_key: str | None = None
-	while i < len(lines):
-		line = lines[i]
-		i += 1
-		if line.strip() == '---':
-			break
-		if not line.strip() or line.lstrip().startswith('#'):
-			continue
-		if line.lstrip().startswith('- ') and current_list_key:
-			data.setdefault(current_list_key, []).append(line.strip()[2:])
-			continue
-		current_list_key = None
-		if ':' not in line:
-			continue
-		key, raw = line.split(':', 1)
-		key = key.strip()
-		raw = raw.strip()
-		if raw == '':
-			current_list_key = key
-			data[key] = []
-			continue
-		if raw.isdigit():
-			data[key] = int(raw)
-			continue
-		data[key] = raw
-	return data
+from typing import Any, Iterable, Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import config_signature, emit, fresh_state, loads, parse_frontmatter, write_state_atomic
 
 
 def try_parse_json(text: str) -> Any | None:
@@ -55,7 +21,7 @@ def try_parse_json(text: str) -> Any | None:
 	if not (text.startswith('{') or text.startswith('[')):
 		return None
 	try:
-		return json.loads(text)
+		return loads(text)
 	except Exception:
 		return None
 
@@ -65,15 +31,18 @@ def extract_json(text: str) -> Any | None:
 	if not text:
 		return None
 	decoder = json.JSONDecoder()
-	for i, ch in enumerate(text):
-		if ch not in '[{':
-			continue
+	i = 0
+	while True:
+		j_obj = text.find('{', i)
+		j_arr = text.find('[', i)
+		j = min((x for x in (j_obj, j_arr) if x != -1), default=-1)
+		if j < 0:
+			return None
 		try:
-			obj, _end = decoder.raw_decode(text[i:])
+			obj, _end = decoder.raw_decode(text, j)
 			return obj
 		except Exception:
-			continue
-	return None
+			i = j + 1
 
 
 def pick_dt(v: Any) -> str:
@@ -84,13 +53,24 @@ def pick_dt(v: Any) -> str:
 	return str(v)
 
 
-def normalize_event(raw: dict[str, Any], account: str, calendar_id: str) -> dict[str, Any] | None:
-	eid = str(raw.get('id') or raw.get('eventId') or '')
+def normalize_event(
+	raw: dict[str, Any],
+	account: str,
+	calendar_id: str,
+	_isinstance=isinstance,
+	_str=str,
+	_dict=dict,
+	_list=list,
+) -> dict[str, Any] | None:
+	# Called once per event: builtins are bound as defaults and raw.get is cached
+	# so the lookups below are all locals.
+	g = raw.get
+	eid = _str(g('id') or g('eventId') or '')
 	if not eid:
 		return None
-	summary = raw.get('summary') or raw.get('title') or ''
-	start = pick_dt(raw.get('start') or raw.get('startTime'))
-	end = pick_dt(raw.get('end') or raw.get('endTime'))
+	summary = g('summary') or g('title') or ''
+	start = pick_dt(g('start') or g('startTime'))
+	end = pick_dt(g('end') or g('endTime'))
 	out: dict[str, Any] = {
 		'id': eid,
 		'summary': summary,
@@ -100,18 +80,20 @@ def normalize_event(raw: dict[str, Any], account: str, calendar_id: str) -> dict
 		'calendar_id': calendar_id,
 	}
 	for k in ('location', 'description', 'htmlLink'):
-		if k in raw and raw.get(k) is not None:
-			out[k] = raw.get(k)
-	att = raw.get('attendees')
-	if isinstance(att, list):
+		v = g(k)
+		if v is not None:
+			out[k] = v
+	att = g('attendees')
+	if _isinstance(att, _list):
 		emails: list[str] = []
+		append = emails.append
 		for a in att:
-			if isinstance(a, dict):
+			if _isinstance(a, _dict):
 				email = a.get('email')
-				if isinstance(email, str) and email:
-					emails.append(email)
-			elif isinstance(a, str) and a:
-				emails.append(a)
+				if _isinstance(email, _str) and email:
+					append(email)
+			elif _isinstance(a, _str) and a:
+				append(a)
 		if emails:
 			out['attendees'] = emails
 	return out
@@ -140,21 +122,13 @@ def parse_events(parsed: Any, account: str, calendar_id: str) -> list[dict[str,
 	return items
 
 
-def parse_tsv_events(text: str, account: str, calendar_id: str) -> list[dict[str, Any]]:
-	text = (text or '').strip()
-	if not text:
-		return []
-	if text.strip().lower() == 'no events':
-		return []
-	lines = [l for l in text.splitlines() if l.strip()]
-	if not lines:
-		return []
-	header = lines[0].strip()
-	if not header.upper().startswith('ID\tSTART\tEND\tSUMMARY'):
-		return []
-	out: list[dict[str, Any]] = []
-	for line in lines[1:]:
-		cols = line.split('\t')
+_TSV_HEADER = 'ID\tSTART\tEND\tSUMMARY'
+_TSV_LINE_RE = re.compile(r'[^\r\n]+')
+
+
+def parse_tsv_rows(lines: Iterable[str], account: str, calendar_id: str) -> Iterator[dict[str, Any]]:
+	for line in lines:
+		cols = line.rstrip('\r\n').split('\t', 3)
 		if len(cols) < 4:
 			continue
 		eid = cols[0].strip()
@@ -162,12 +136,48 @@ def parse_tsv_events(text: str, account: str, calendar_id: str) -> list[dict[str
 			continue
 		start = cols[1].strip()
 		end = cols[2].strip()
-		summary = '\t'.join(cols[3:]).strip()
+		summary = cols[3].strip()
 		raw = {'id': eid, 'summary': summary, 'start': start, 'end': end}
 		n = normalize_event(raw, account, calendar_id)
 		if n:
-			out.append(n)
-	return out
+			yield n
+
+
+def parse_tsv_events(text: str, account: str, calendar_id: str) -> list[dict[str, Any]]:
+	text = (text or '').strip()
+	if not text:
+		return []
+	if text.lower() == 'no events':
+		return []
+	lines = (m.group() for m in _TSV_LINE_RE.finditer(text))
+	header = next(lines, '').strip()
+	if not header.upper().startswith(_TSV_HEADER):
+		return []
+	return list(parse_tsv_rows(lines, account, calendar_id))
+
+
+def fetch_events(argv: list[str], account: str, calendar_id: str) -> tuple[int, list[dict[str, Any]] | None, str, str]:
+	# Read gccli's stdout as it is produced. The TSV listing is normalized row by
+	# row (events is a list); any other output is returned whole (events is None)
+	# for the JSON parsers. stderr goes to a temp file so it cannot block stdout.
+	events: list[dict[str, Any]] | None = None
+	with tempfile.TemporaryFile() as err:
+		with subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=err, text=True, close_fds=False) as proc:
+			assert proc.stdout is not None
+			first = ''
+			for line in proc.stdout:
+				if line.strip():
+					first = line
+					break
+			if first.strip().upper().startswith(_TSV_HEADER):
+				events = list(parse_tsv_rows(proc.stdout, account, calendar_id))
+				raw_out = first
+			else:
+				raw_out = first + proc.stdout.read()
+			returncode = proc.wait()
+		err.seek(0)
+		stderr = err.read().decode('utf-8', errors='replace')
+	return returncode, events, raw_out, stderr
 
 
 def main() -> int:
@@ -176,13 +186,14 @@ def main() -> int:
 		emit({'type': 'error', 'message': 'POS_DIR not set'})
 		return 1
 
-	skill_md = os.path.join(pos_dir, 'skills', 'gcal', 'SKILL.md')
+	skill_md = f'{pos_dir}/skills/gcal/SKILL.md'
 	prefs = parse_frontmatter(skill_md)
 	accounts = prefs.get('accounts') or []
 	calendar_id = prefs.get('calendar_id') or 'primary'
 	max_events = int(prefs.get('max_events') or 50)
 	days_back = int(prefs.get('days_back') or 1)
 	days_ahead = int(prefs.get('days_ahead') or 14)
+	sync_ttl_seconds = int(prefs.get('sync_ttl_seconds') or 0)
 	if not isinstance(accounts, list):
 		accounts = []
 	if not accounts:
@@ -193,24 +204,30 @@ def main() -> int:
 		emit({'type': 'error', 'message': 'gcal accounts not configured in SKILL.md frontmatter'})
 		return 1
 
+	state_path = f'{pos_dir}/STATE/gcal.json'
+	sig = config_signature(accounts, calendar_id, max_events, days_back, days_ahead)
+	cached = fresh_state(state_path, sig, sync_ttl_seconds)
+	if cached is not None:
+		emit({'type': 'progress', 'message': f'gcal state is fresh (sync_ttl_seconds={sync_ttl_seconds}); skipping gccli', 'pct': 0.9})
+		emit({'type': 'result', 'ok': True, 'data': {'events': len(cached.get('events') or []), 'accounts': accounts, 'calendar_id': calendar_id, 'cached': True}})
+		return 0
+
 	now = datetime.now(timezone.utc)
 	start = now - timedelta(days=days_back)
 	end = now + timedelta(days=days_ahead)
 	start_s = start.isoformat().replace('+00:00', 'Z')
 	end_s = end.isoformat().replace('+00:00', 'Z')
 
-	all_events: list[dict[str, Any]] = []
+	targets = [a for a in accounts if isinstance(a, str) and a]
+	streams: dict[str, list[dict[str, Any]]] = {}
 	per_account: dict[str, int] = {}
 	per_account_debug: dict[str, Any] = {}
 	per_account_errors: dict[str, Any] = {}
-	for idx, account in enumerate(accounts):
-		if not isinstance(account, str) or not account:
-			continue
-		pct = 0.1 + 0.7 * (idx / max(len(accounts), 1))
-		emit({'type': 'progress', 'message': f'gccli {account} events {calendar_id}', 'pct': pct})
-
-		try:
-			proc = subprocess.run(
+	emit({'type': 'progress', 'message': f'gccli events {calendar_id} ({len(targets)} accounts)', 'pct': 0.1})
+	with ThreadPoolExecutor(max_workers=max(len(targets), 1)) as executor:
+		futures = {
+			executor.submit(
+				fetch_events,
 				[
 					'gccli',
 					account,
@@ -223,38 +240,48 @@ def main() -> int:
 					'--max',
 					str(max_events),
 				],
-				check=True,
-				capture_output=True,
-				text=True,
-			)
-		except FileNotFoundError:
-			emit({'type': 'error', 'message': 'gccli not found in PATH'})
-			return 1
-		except subprocess.CalledProcessError as e:
-			per_account_errors[account] = {
-				'code': e.returncode,
-				'stderr': (e.stderr or '').strip(),
-			}
-			continue
+				account,
+				str(calendar_id),
+			): account
+			for account in targets
+		}
+		for done, future in enumerate(as_completed(futures), start=1):
+			account = futures[future]
+			pct = 0.1 + 0.7 * (done / max(len(targets), 1))
+			emit({'type': 'progress', 'message': f'gccli {account} events {calendar_id}', 'pct': pct})
+			try:
+				returncode, events, raw_out, stderr = future.result()
+			except FileNotFoundError:
+				emit({'type': 'error', 'message': 'gccli not found in PATH'})
+				return 1
+			if returncode != 0:
+				per_account_errors[account] = {
+					'code': returncode,
+					'stderr': stderr.strip(),
+				}
+				continue
+
+			if events is None:
+				raw_out = raw_out.strip()
+				parsed = extract_json(raw_out) or try_parse_json(raw_out)
+				events = parse_events(parsed, account, str(calendar_id))
+				if parsed is None and not events:
+					events = parse_tsv_events(raw_out, account, str(calendar_id))
+				if parsed is None and not events:
+					per_account_debug[account] = {
+						'parse_error': True,
+						'stdout_head': raw_out[:2000],
+						'stderr_head': stderr.strip()[:2000],
+					}
+			streams[account] = events
+			per_account[account] = len(events)
 
-		raw_out = (proc.stdout or '').strip()
-		parsed = extract_json(raw_out) or try_parse_json(raw_out)
-		events = parse_events(parsed, account, str(calendar_id))
-		if parsed is None and not events:
-			events = parse_tsv_events(raw_out, account, str(calendar_id))
-		if parsed is None and not events:
-			per_account_debug[account] = {
-				'parse_error': True,
-				'stdout_head': raw_out[:2000],
-				'stderr_head': (proc.stderr or '').strip()[:2000],
-			}
-		all_events.extend(events)
-		per_account[account] = len(events)
-
-	# Sort by start time where possible.
+	# Sort by start time where possible. Accounts are joined in config order so
+	# ties stay stable whichever call finished first.
 	def start_key(e: dict[str, Any]) -> str:
 		return str(e.get('start') or '')
 
+	all_events = [e for a in targets for e in streams.get(a, ())]
 	all_events.sort(key=start_key)
 
 	last_sync = now.isoformat().replace('+00:00', 'Z')
@@ -268,13 +295,11 @@ def main() -> int:
 		'errors': per_account_errors or None,
 		'debug': per_account_debug or None,
 		'raw': None,
+		'_sig': sig,
 	}
 
-	os.makedirs(os.path.join(pos_dir, 'STATE'), exist_ok=True)
-	state_path = os.path.join(pos_dir, 'STATE', 'gcal.json')
-	with open(state_path, 'w', encoding='utf-8') as f:
-		json.dump(state, f, indent=2, ensure_ascii=False)
-		f.write('\n')
+	os.makedirs(f'{pos_dir}/STATE', exist_ok=True)
+	write_state_atomic(state_path, state)
 
 	emit({'type': 'artifact', 'path': 'STATE/gcal.json', 'description': 'Updated calendar index state'})
 	emit({'type': 'result', 'ok': True, 'data': {'events': len(all_events), 'accounts': accounts, 'calendar_id': calendar_id}})
@@ -1,20 +1,17 @@
 #!/usr/bin/env python3
 
-import json
+import os
 import sys
-from typing import Any
 
-
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import emit
 
 
 def main() -> int:
 	# MVP: refuse GitHub mutations.
 	try:
-		json.load(sys.stdin)
-	except Exception:
+		sys.stdin.buffer.read()
+	except OSError:
 		pass
 	emit({'type': 'error', 'message': 'github.apply is disabled in MVP'})
 	return 1
@@ -1,14 +1,10 @@
 #!/usr/bin/env python3
 
-import json
 import os
 import sys
-from typing import Any
 
-
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import emit
 
 
 def main() -> int:
@@ -1,86 +1,43 @@
 #!/usr/bin/env python3
 
-import json
 import os
+import re
 import subprocess
 import sys
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import config_signature, emit, fresh_state, loads, now_iso, parse_frontmatter, run_cmd, write_state_atomic
 
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
-
-
-def parse_frontmatter(md_path: str) -> dict[str, Any]:
-	with open(md_path, 'r', encoding='utf-8') as f:
-		lines = f.read().splitlines()
-	if not lines or lines[0].strip() != '---':
-		return {}
-	data: dict[str, Any] = {}
-	i = 1
-	current_list_key: str | None = None
-	while i < len(lines):
-		line = lines[i]
-		i += 1
-		if line.strip() == '---':
-			break
-		if not line.strip() or line.lstrip().startswith('#'):
-			continue
-		if line.lstrip().startswith('- ') and current_list_key:
-			data.setdefault(current_list_key, []).append(line.strip()[2:])
-			continue
-		current_list_key = None
-		if ':' not in line:
-			continue
-		key, raw = line.split(':', 1)
-		key = key.strip()
-		raw = raw.strip()
-		if raw == '':
-			current_list_key = key
-			data[key] = []
-			continue
-		if raw.isdigit():
-			data[key] = int(raw)
-		else:
-			data[key] = raw
-	return data
+
+_AUTH_RE = re.compile(r'Logged in to github\.com account (\S+)|- Active account:[ \t]*(\w+)|- Token scopes:[ \t]*(.*)')
 
 
 def parse_auth_status(output: str) -> list[dict[str, Any]]:
 	accounts: list[dict[str, Any]] = []
 	current: dict[str, Any] | None = None
-	for raw in output.splitlines():
-		line = raw.strip()
-		if not line:
-			continue
-		if 'Logged in to github.com account ' in line:
-			login = line.split('Logged in to github.com account ', 1)[1].split(' ', 1)[0].strip()
+	for m in _AUTH_RE.finditer(output):
+		login, active, scopes = m.groups()
+		if login is not None:
 			current = {'login': login, 'active': False, 'scopes': ''}
 			accounts.append(current)
 			continue
 		if not current:
 			continue
-		if line.startswith('- Active account:'):
-			val = line.split(':', 1)[1].strip().lower()
-			current['active'] = val == 'true'
-			continue
-		if line.startswith('- Token scopes:'):
-			scopes = line.split(':', 1)[1].strip()
-			current['scopes'] = scopes.replace("'", '')
+		if active is not None:
+			current['active'] = active.lower() == 'true'
 			continue
+		current['scopes'] = scopes.strip().replace("'", '')
 	return accounts
 
 
 def gh_json(args: list[str]) -> Any:
-	proc = subprocess.run(['gh', *args], check=True, capture_output=True, text=True)
-	return json.loads(proc.stdout)
+	proc = run_cmd(['gh', *args], check=True)
+	return loads(proc.stdout)
 
 
-GRAPHQL_SEARCH_PRS = """
-query($q: String!, $first: Int!) {
-  search(query: $q, type: ISSUE, first: $first) {
+GRAPHQL_PR_NODES = """
     nodes {
       __typename
       ... on PullRequest {
@@ -93,24 +50,97 @@ query($q: String!, $first: Int!) {
         author { login }
       }
     }
-  }
-}
-""".strip()
+""".strip('\n')
 
 
-def graphql_search_prs(query: str, limit: int) -> list[dict[str, Any]]:
-	data = gh_json(['api', 'graphql', '-f', f'query={GRAPHQL_SEARCH_PRS}', '-f', f'q={query}', '-F', f'first={limit}'])
-	nodes = (((data or {}).get('data') or {}).get('search') or {}).get('nodes') or []
-	if not isinstance(nodes, list):
+def search_prs_document(count: int) -> str:
+	# One aliased search (a0, a1, ...) per query string, all in a single request.
+	params = ''.join(f', $q{i}: String!' for i in range(count))
+	searches = ''.join(f'  a{i}: search(query: $q{i}, type: ISSUE, first: $first) {{\n{GRAPHQL_PR_NODES}\n  }}\n' for i in range(count))
+	return f'query($first: Int!{params}) {{\n{searches}}}'
+
+
+def graphql_search_prs(queries: list[str], limit: int) -> list[list[dict[str, Any]]]:
+	args = ['api', 'graphql', '-f', f'query={search_prs_document(len(queries))}', '-F', f'first={limit}']
+	for i, q in enumerate(queries):
+		args += ['-f', f'q{i}={q}']
+	data = gh_json(args)
+	root = ((data or {}).get('data') or {}) if isinstance(data, dict) else {}
+	results: list[list[dict[str, Any]]] = []
+	for i in range(len(queries)):
+		nodes = (root.get(f'a{i}') or {}).get('nodes') or []
+		if not isinstance(nodes, list):
+			nodes = []
+		results.append([n for n in nodes if isinstance(n, dict) and n.get('__typename') == 'PullRequest'])
+	return results
+
+
+def _norm_notif(n: dict[str, Any], _isinstance=isinstance, _str=str, _bool=bool) -> dict[str, Any]:
+	# Builtins are bound as defaults so the per-notification lookups are locals.
+	get = n.get
+	repo = get('repository')
+	repo_name = (repo.get('full_name') or '') if _isinstance(repo, dict) else ''
+	subj = get('subject') or {}
+	if not _isinstance(subj, dict):
+		subj = {}
+	subj_get = subj.get
+	updated_at = get('updated_at') or ''
+	return {
+		'id': _str(get('id') or ''),
+		'repo': repo_name,
+		'title': subj_get('title') or '',
+		'type': subj_get('type') or '',
+		'unread': _bool(get('unread')),
+		'updated_at': updated_at,
+		'date': updated_at,
+		'url': subj_get('url') or get('url') or '',
+	}
+
+
+def authored_pr_items(logins: list[str], limit: int) -> list[dict[str, Any]]:
+	queries = [f'is:pr author:{login} sort:updated-desc' for login in logins]
+	items: list[dict[str, Any]] = []
+	for login, nodes in zip(logins, graphql_search_prs(queries, limit)):
+		for n in nodes:
+			repo = ((n.get('repository') or {}) if isinstance(n.get('repository'), dict) else {})
+			items.append(
+				{
+					'kind': 'pr',
+					'title': n.get('title') or '',
+					'url': n.get('url') or '',
+					'repo': repo.get('nameWithOwner') or '',
+					'number': n.get('number') or 0,
+					'state': n.get('state') or '',
+					'updatedAt': n.get('updatedAt') or '',
+					'account': login,
+					'source': 'authored',
+				},
+			)
+	return items
+
+
+def tracked_repo_items(repo: str, kind: str, limit: int) -> list[dict[str, Any]]:
+	rows = gh_json([kind, 'list', '-R', repo, '--limit', str(limit), '--json', 'title,url,number,state,updatedAt,author'])
+	if not isinstance(rows, list):
 		return []
-	out: list[dict[str, Any]] = []
-	for n in nodes:
-		if not isinstance(n, dict):
-			continue
-		if n.get('__typename') != 'PullRequest':
+	items: list[dict[str, Any]] = []
+	for r in rows:
+		if not isinstance(r, dict):
 			continue
-		out.append(n)
-	return out
+		items.append(
+			{
+				'kind': kind,
+				'title': r.get('title') or '',
+				'url': r.get('url') or '',
+				'repo': repo,
+				'number': r.get('number') or 0,
+				'state': r.get('state') or '',
+				'updatedAt': r.get('updatedAt') or '',
+				'account': '',
+				'source': 'tracked',
+			},
+		)
+	return items
 
 
 def main() -> int:
@@ -119,7 +149,7 @@ def main() -> int:
 		emit({'type': 'error', 'message': 'POS_DIR not set'})
 		return 1
 
-	skill_md = os.path.join(pos_dir, 'skills', 'github', 'SKILL.md')
+	skill_md = f'{pos_dir}/skills/github/SKILL.md'
 	prefs = parse_frontmatter(skill_md)
 	max_notifications = int(prefs.get('max_notifications') or 50)
 	max_items = int(prefs.get('max_items') or 30)
@@ -127,15 +157,51 @@ def main() -> int:
 	tracked_repos = prefs.get('tracked_repos') or []
 	if not isinstance(tracked_repos, list):
 		tracked_repos = []
+	sync_ttl_seconds = int(prefs.get('sync_ttl_seconds') or 0)
+
+	state_path = f'{pos_dir}/STATE/github.json'
+	sig = config_signature(max_notifications, max_items, tracked_repo_limit, tracked_repos)
+	cached = fresh_state(state_path, sig, sync_ttl_seconds)
+	if cached is not None:
+		emit({'type': 'progress', 'message': f'github state is fresh (sync_ttl_seconds={sync_ttl_seconds}); skipping gh', 'pct': 0.9})
+		emit(
+			{
+				'type': 'result',
+				'ok': True,
+				'data': {
+					'accounts': len(cached.get('accounts') or []),
+					'notifications': len(cached.get('notifications') or []),
+					'login': (cached.get('user') or {}).get('login'),
+					'notifications_error': cached.get('notifications_error'),
+					'cached': True,
+				},
+			},
+		)
+		return 0
+
+	# The three prologue calls are independent; start them together and consume
+	# the results in the usual order.
+	executor = ThreadPoolExecutor(max_workers=3)
+	user_future = executor.submit(run_cmd, ['gh', 'api', 'user'], check=True)
+	auth_future = executor.submit(run_cmd, ['gh', 'auth', 'status'], check=True)
+	notifications_future = executor.submit(
+		run_cmd,
+		[
+			'gh',
+			'api',
+			'/notifications',
+			'-H',
+			'Accept: application/vnd.github+json',
+			'-F',
+			f'per_page={max_notifications}',
+		],
+		check=True,
+	)
+	executor.shutdown(wait=False)
 
 	emit({'type': 'progress', 'message': 'gh api user', 'pct': 0.1})
 	try:
-		user_proc = subprocess.run(
-			['gh', 'api', 'user'],
-			check=True,
-			capture_output=True,
-			text=True,
-		)
+		user_proc = user_future.result()
 	except FileNotFoundError:
 		emit({'type': 'error', 'message': 'gh not found in PATH'})
 		return 1
@@ -150,18 +216,13 @@ def main() -> int:
 		return 1
 
 	try:
-		user = json.loads(user_proc.stdout)
+		user = loads(user_proc.stdout)
 	except Exception:
 		user = {}
 
 	emit({'type': 'progress', 'message': 'gh auth status', 'pct': 0.3})
 	try:
-		auth_proc = subprocess.run(
-			['gh', 'auth', 'status'],
-			check=True,
-			capture_output=True,
-			text=True,
-		)
+		auth_proc = auth_future.result()
 		accounts = parse_auth_status(auth_proc.stdout)
 	except subprocess.CalledProcessError:
 		accounts = []
@@ -169,146 +230,71 @@ def main() -> int:
 	notifications_error = None
 	emit({'type': 'progress', 'message': 'gh api /notifications', 'pct': 0.5})
 	try:
-		n_proc = subprocess.run(
-			[
-				'gh',
-				'api',
-				'/notifications',
-				'-H',
-				'Accept: application/vnd.github+json',
-				'-F',
-				f'per_page={max_notifications}',
-			],
-			check=True,
-			capture_output=True,
-			text=True,
-		)
+		n_proc = notifications_future.result()
 	except subprocess.CalledProcessError as e:
 		notifications_raw = []
 		notifications_error = (e.stderr or '').strip() or f'gh api /notifications failed (code={e.returncode})'
 	else:
 		try:
-			notifications_raw = json.loads(n_proc.stdout)
+			notifications_raw = loads(n_proc.stdout)
 		except Exception:
 			notifications_raw = []
 
 	notifications: list[dict[str, Any]] = []
 	if isinstance(notifications_raw, list):
-		for n in notifications_raw:
-			if not isinstance(n, dict):
-				continue
-			repo = (n.get('repository') or {}).get('full_name') if isinstance(n.get('repository'), dict) else None
-			subj = n.get('subject') or {}
-			if not isinstance(subj, dict):
-				subj = {}
-			updated_at = n.get('updated_at') or ''
-			notifications.append(
-				{
-					'id': str(n.get('id') or ''),
-					'repo': repo or '',
-					'title': subj.get('title') or '',
-					'type': subj.get('type') or '',
-					'unread': bool(n.get('unread')),
-					'updated_at': updated_at,
-					'date': updated_at,
-					'url': subj.get('url') or n.get('url') or '',
-				},
-			)
+		notifications = [_norm_notif(n) for n in notifications_raw if isinstance(n, dict)]
 
 	items: list[dict[str, Any]] = []
 	items_errors: dict[str, Any] = {}
 	logins = [a.get('login') for a in accounts if isinstance(a, dict) and isinstance(a.get('login'), str)]
 	logins = [l for l in logins if l]
-	emit({'type': 'progress', 'message': 'gh api graphql (recent PRs)', 'pct': 0.7})
-	for idx, login in enumerate(logins):
-		try:
-			nodes = graphql_search_prs(f'is:pr author:{login} sort:updated-desc', min(max_items, 50))
-			for n in nodes:
-				repo = ((n.get('repository') or {}) if isinstance(n.get('repository'), dict) else {})
-				repo_name = repo.get('nameWithOwner') or ''
-				num = n.get('number') or 0
-				items.append(
-					{
-						'kind': 'pr',
-						'title': n.get('title') or '',
-						'url': n.get('url') or '',
-						'repo': repo_name,
-						'number': num,
-						'state': n.get('state') or '',
-						'updatedAt': n.get('updatedAt') or '',
-						'account': login,
-						'source': 'authored',
-					},
-				)
-		except subprocess.CalledProcessError as e:
-			items_errors[f'prs:{login}'] = (e.stderr or '').strip() or f'gh api graphql failed (code={e.returncode})'
-		except Exception as e:
-			items_errors[f'prs:{login}'] = str(e)
-		pct = 0.7 + 0.1 * ((idx + 1) / max(len(logins), 1))
-		emit({'type': 'progress', 'message': f'recent PRs: {login}', 'pct': pct})
-
-	if tracked_repos:
-		emit({'type': 'progress', 'message': 'gh repo items (tracked repos)', 'pct': 0.82})
+	# One batched search for every login's authored PRs plus one task per tracked
+	# repo list; results are kept in submission order so de-dupe below stays
+	# deterministic. A failed task records its error under each of its keys.
+	tasks: list[tuple[list[str], str, Any, tuple[Any, ...]]] = []
+	if logins:
+		tasks.append(([f'prs:{login}' for login in logins], f'recent PRs: {", ".join(logins)}', authored_pr_items, (logins, min(max_items, 50))))
 	for repo in tracked_repos:
 		if not isinstance(repo, str) or not repo:
 			continue
-		try:
-			prs = gh_json(['pr', 'list', '-R', repo, '--limit', str(tracked_repo_limit), '--json', 'title,url,number,state,updatedAt,author'])
-			if isinstance(prs, list):
-				for p in prs:
-					if not isinstance(p, dict):
-						continue
-					items.append(
-						{
-							'kind': 'pr',
-							'title': p.get('title') or '',
-							'url': p.get('url') or '',
-							'repo': repo,
-							'number': p.get('number') or 0,
-							'state': p.get('state') or '',
-							'updatedAt': p.get('updatedAt') or '',
-							'account': '',
-							'source': 'tracked',
-						},
-					)
-			issues = gh_json(['issue', 'list', '-R', repo, '--limit', str(tracked_repo_limit), '--json', 'title,url,number,state,updatedAt,author'])
-			if isinstance(issues, list):
-				for it in issues:
-					if not isinstance(it, dict):
-						continue
-					items.append(
-						{
-							'kind': 'issue',
-							'title': it.get('title') or '',
-							'url': it.get('url') or '',
-							'repo': repo,
-							'number': it.get('number') or 0,
-							'state': it.get('state') or '',
-							'updatedAt': it.get('updatedAt') or '',
-							'account': '',
-							'source': 'tracked',
-						},
-					)
-		except subprocess.CalledProcessError as e:
-			items_errors[f'tracked:{repo}'] = (e.stderr or '').strip() or f'gh list failed (code={e.returncode})'
-		except Exception as e:
-			items_errors[f'tracked:{repo}'] = str(e)
-
-	# De-dupe + sort.
-	seen_urls: set[str] = set()
-	unique: list[dict[str, Any]] = []
+		for kind in ('pr', 'issue'):
+			tasks.append(([f'tracked:{repo}'], f'tracked {kind}s: {repo}', tracked_repo_items, (repo, kind, tracked_repo_limit)))
+
+	emit({'type': 'progress', 'message': 'gh api graphql (recent PRs)', 'pct': 0.7})
+	if tracked_repos:
+		emit({'type': 'progress', 'message': 'gh repo items (tracked repos)', 'pct': 0.72})
+	results: list[list[dict[str, Any]]] = [[] for _ in tasks]
+	if tasks:
+		with ThreadPoolExecutor(max_workers=min(16, len(tasks))) as executor:
+			futures = {executor.submit(fn, *args): i for i, (_keys, _label, fn, args) in enumerate(tasks)}
+			for done, future in enumerate(as_completed(futures), start=1):
+				i = futures[future]
+				keys, label = tasks[i][0], tasks[i][1]
+				error = None
+				try:
+					results[i] = future.result()
+				except subprocess.CalledProcessError as e:
+					failed = 'gh api graphql failed' if keys[0].startswith('prs:') else 'gh list failed'
+					error = (e.stderr or '').strip() or f'{failed} (code={e.returncode})'
+				except Exception as e:
+					error = str(e)
+				if error is not None:
+					for key in keys:
+						items_errors.setdefault(key, error)
+				pct = 0.72 + 0.13 * (done / len(tasks))
+				emit({'type': 'progress', 'message': label, 'pct': pct})
+	for chunk in results:
+		items.extend(chunk)
+
+	# De-dupe (first occurrence of a URL wins) + sort.
+	by_url: dict[str, dict[str, Any]] = {}
 	for it in items:
-		url = it.get('url') or ''
-		if not isinstance(url, str) or not url:
-			continue
-		if url in seen_urls:
-			continue
-		seen_urls.add(url)
-		unique.append(it)
-	unique.sort(key=lambda x: str(x.get('updatedAt') or ''), reverse=True)
-	items = unique[:max_items]
+		url = it.get('url')
+		if isinstance(url, str) and url and url not in by_url:
+			by_url[url] = it
+	items = sorted(by_url.values(), key=lambda x: str(x.get('updatedAt') or ''), reverse=True)[:max_items]
 
-	last_sync = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+	last_sync = now_iso()
 	state = {
 		'last_sync': last_sync,
 		'user': {'login': user.get('login') or '', 'name': user.get('name') or ''},
@@ -323,13 +309,11 @@ def main() -> int:
 			'items_count': len(items),
 			'accounts_count': len(accounts),
 		},
+		'_sig': sig,
 	}
 
-	os.makedirs(os.path.join(pos_dir, 'STATE'), exist_ok=True)
-	state_path = os.path.join(pos_dir, 'STATE', 'github.json')
-	with open(state_path, 'w', encoding='utf-8') as f:
-		json.dump(state, f, indent=2, ensure_ascii=False)
-		f.write('\n')
+	os.makedirs(f'{pos_dir}/STATE', exist_ok=True)
+	write_state_atomic(state_path, state)
 
 	emit({'type': 'artifact', 'path': 'STATE/github.json', 'description': 'Updated github state'})
 	emit(
@@ -1,47 +1,40 @@
 #!/usr/bin/env python3
 
-import json
 import os
-import subprocess
+import shutil
 import sys
 from typing import Any
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import apply_workers, emit, loads, parse_frontmatter, run_cmd
+
+# op -> gmcli labels flag and label.
+LABEL_CHANGES: dict[str, tuple[str, str]] = {
+	'star': ('--add', 'STARRED'),
+	'mark_read': ('--remove', 'UNREAD'),
+	'archive': ('--remove', 'INBOX'),
+}
+
+
+def label_threads(gmcli: str, account: str, thread_ids: list[str], flag: str, label: str) -> dict[str, Any] | None:
+	# Returns None on success, or the error fields for the result rows.
+	import subprocess
+
+	try:
+		run_cmd([gmcli, account, 'labels', *thread_ids, flag, label], check=True)
+	except subprocess.CalledProcessError as e:
+		return {'error': (e.stderr or '').strip() or 'gmcli failed', 'code': e.returncode}
+	return None
 
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
-
-
-def parse_frontmatter(md_path: str) -> dict[str, Any]:
-	with open(md_path, 'r', encoding='utf-8') as f:
-		lines = f.read().splitlines()
-	if not lines or lines[0].strip() != '---':
-		return {}
-	data: dict[str, Any] = {}
-	i = 1
-	current_list_key: str | None = None
-	while i < len(lines):
-		line = lines[i]
-		i += 1
-		if line.strip() == '---':
-			break
-		if not line.strip() or line.lstrip().startswith('#'):
-			continue
-		if line.lstrip().startswith('- ') and current_list_key:
-			data.setdefault(current_list_key, []).append(line.strip()[2:])
-			continue
-		current_list_key = None
-		if ':' not in line:
-			continue
-		key, raw = line.split(':', 1)
-		key = key.strip()
-		raw = raw.strip()
-		if raw == '':
-			current_list_key = key
-			data[key] = []
-			continue
-		data[key] = raw
-	return data
+
+def apply_batch(gmcli: str, account: str, flag: str, label: str, thread_ids: list[str]) -> list[dict[str, Any] | None]:
+	# One error entry (None on success) per thread id.
+	error = label_threads(gmcli, account, thread_ids, flag, label)
+	if error is not None and len(thread_ids) > 1:
+		# Label changes are idempotent: retry one thread at a time so a single
+		# bad id does not fail the whole batch.
+		return [label_threads(gmcli, account, [tid], flag, label) for tid in thread_ids]
+	return [error] * len(thread_ids)
 
 
 def main() -> int:
@@ -50,7 +43,7 @@ def main() -> int:
 		emit({'type': 'error', 'message': 'POS_DIR not set'})
 		return 1
 
-	skill_md = os.path.join(pos_dir, 'skills', 'gmail', 'SKILL.md')
+	skill_md = f'{pos_dir}/skills/gmail/SKILL.md'
 	prefs = parse_frontmatter(skill_md)
 	accounts = prefs.get('accounts') or []
 	if not isinstance(accounts, list):
@@ -64,8 +57,10 @@ def main() -> int:
 		return 1
 
 	try:
-		payload = json.load(sys.stdin)
+		payload = loads(sys.stdin.buffer.read())
 	except Exception:
+		payload = None
+	if not isinstance(payload, dict):
 		emit({'type': 'error', 'message': 'Expected JSON on stdin'})
 		return 1
 
@@ -73,11 +68,24 @@ def main() -> int:
 	if not isinstance(actions, list):
 		emit({'type': 'error', 'message': 'proposed_actions must be a list'})
 		return 1
+	if not actions:
+		emit({'type': 'result', 'ok': True, 'data': {'results': []}})
+		return 0
+
+	gmcli = shutil.which('gmcli')
+	if gmcli is None:
+		emit({'type': 'error', 'message': 'gmcli not found in PATH'})
+		return 1
+
+	from concurrent.futures import ThreadPoolExecutor, as_completed
 
 	emit({'type': 'progress', 'message': f'Applying {len(actions)} actions...', 'pct': 0.1})
 
-	results: list[dict[str, Any]] = []
-	for idx, action in enumerate(actions):
+	# One gmcli call per (account, label change) instead of one per action: gmcli
+	# labels accepts several thread ids. Results keep the order of the actions.
+	results: list[dict[str, Any] | None] = []
+	batches: dict[tuple[str, str, str], list[tuple[int, Any, Any, Any]]] = {}
+	for action in actions:
 		if not isinstance(action, dict):
 			continue
 		op = action.get('op')
@@ -95,37 +103,33 @@ def main() -> int:
 		if not account or not isinstance(account, str):
 			account = accounts[0]
 
-		cmd: list[str] | None = None
-		if op == 'star':
-			cmd = ['gmcli', account, 'labels', str(thread_id), '--add', 'STARRED']
-		elif op == 'mark_read':
-			cmd = ['gmcli', account, 'labels', str(thread_id), '--remove', 'UNREAD']
-		elif op == 'archive':
-			cmd = ['gmcli', account, 'labels', str(thread_id), '--remove', 'INBOX']
-		else:
+		change = LABEL_CHANGES.get(op) if isinstance(op, str) else None
+		if change is None:
 			results.append({'ok': False, 'error': f'unsupported op: {op}', 'action': action.get('id')})
 			continue
-
-		try:
-			subprocess.run(cmd, check=True, capture_output=True, text=True)
-			results.append({'ok': True, 'action': action.get('id'), 'op': op, 'thread_id': thread_id, 'account': account})
-		except FileNotFoundError:
-			emit({'type': 'error', 'message': 'gmcli not found in PATH'})
-			return 1
-		except subprocess.CalledProcessError as e:
-			results.append(
-				{
-					'ok': False,
-					'action': action.get('id'),
-					'op': op,
-					'thread_id': thread_id,
-					'account': account,
-					'error': (e.stderr or '').strip() or 'gmcli failed',
-					'code': e.returncode,
-				},
-			)
-
-		emit({'type': 'progress', 'message': f'{idx + 1}/{len(actions)} done', 'pct': 0.1 + 0.9 * ((idx + 1) / max(len(actions), 1))})
+		batches.setdefault((account, *change), []).append((len(results), action.get('id'), op, thread_id))
+		results.append(None)
+
+	# Batches for different accounts/labels are independent; run them side by
+	# side since each call mostly waits on the Gmail API.
+	with ThreadPoolExecutor(max_workers=apply_workers(len(batches))) as executor:
+		futures = {
+			executor.submit(apply_batch, gmcli, account, flag, label, [str(e[3]) for e in entries]): (account, entries)
+			for (account, flag, label), entries in batches.items()
+		}
+		# About 20 progress events however many batches there are.
+		progress_every = max(1, len(batches) // 20)
+		for done, future in enumerate(as_completed(futures), start=1):
+			account, entries = futures[future]
+			errors = future.result()
+			for (slot, action_id, op, thread_id), err in zip(entries, errors):
+				row = {'ok': err is None, 'action': action_id, 'op': op, 'thread_id': thread_id, 'account': account}
+				if err is not None:
+					row.update(err)
+				results[slot] = row
+
+			if done % progress_every == 0 or done == len(batches):
+				emit({'type': 'progress', 'message': f'{done}/{len(batches)} batches done', 'pct': 0.1 + 0.9 * (done / len(batches))})
 
 	emit({'type': 'result', 'ok': True, 'data': {'results': results}})
 	return 0
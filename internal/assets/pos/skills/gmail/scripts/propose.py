@@ -1,59 +1,14 @@
 #!/usr/bin/env python3
 
-import json
 import os
+import re
 import sys
-from datetime import datetime, timezone
 from typing import Any
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import emit, load_state, now_iso, parse_frontmatter
 
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
-
-
-def parse_frontmatter(md_path: str) -> dict[str, Any]:
-	with open(md_path, 'r', encoding='utf-8') as f:
-		lines = f.read().splitlines()
-	if not lines or lines[0].strip() != '---':
-		return {}
-	data: dict[str, Any] = {}
-	i = 1
-	current_list_key: str | None = None
-	while i < len(lines):
-		line = lines[i]
-		i += 1
-		if line.strip() == '---':
-			break
-		if not line.strip() or line.lstrip().startswith('#'):
-			continue
-		if line.lstrip().startswith('- ') and current_list_key:
-			data.setdefault(current_list_key, []).append(line.strip()[2:])
-			continue
-		current_list_key = None
-		if ':' not in line:
-			continue
-		key, raw = line.split(':', 1)
-		key = key.strip()
-		raw = raw.strip()
-		if raw == '':
-			current_list_key = key
-			data[key] = []
-			continue
-		data[key] = raw
-	return data
-
-
-def load_state(path: str) -> dict[str, Any]:
-	try:
-		with open(path, 'r', encoding='utf-8') as f:
-			return json.load(f)
-	except FileNotFoundError:
-		return {}
-
-
-def now_iso() -> str:
-	return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+_NEWSLETTER_RE = re.compile(r'newsletter|digest|weekly|daily', re.IGNORECASE)
 
 
 def main() -> int:
@@ -62,33 +17,38 @@ def main() -> int:
 		emit({'type': 'error', 'message': 'POS_DIR not set'})
 		return 1
 
-	skill_md = os.path.join(pos_dir, 'skills', 'gmail', 'SKILL.md')
+	skill_md = f'{pos_dir}/skills/gmail/SKILL.md'
 	prefs = parse_frontmatter(skill_md)
-	vip_domains = set(prefs.get('vip_domains') or [])
+	vip_domains = {str(d).lower() for d in prefs.get('vip_domains') or []}
 
-	state = load_state(os.path.join(pos_dir, 'STATE', 'gmail.json'))
+	state = load_state(f'{pos_dir}/STATE/gmail.json')
 	threads = state.get('threads') or []
 
 	emit({'type': 'progress', 'message': f'Analyzing {len(threads)} threads...', 'pct': 0.2})
 
+	# Every proposal from one run shares the run's timestamp.
+	ts = now_iso()
 	actions: list[dict[str, Any]] = []
+	# Hot loop: attribute lookups are bound to locals up front.
+	append = actions.append
+	newsletter_search = _NEWSLETTER_RE.search
 	for t in threads:
 		if not isinstance(t, dict):
 			continue
-		thread_id = str(t.get('id') or '')
-		subject = str(t.get('subject') or '')
-		from_ = str(t.get('from') or '')
-		account = str(t.get('account') or '')
+		g = t.get
+		thread_id = str(g('id') or '')
 		if not thread_id:
 			continue
+		subject = str(g('subject') or '')
+		from_ = str(g('from') or '')
+		account = str(g('account') or '')
 
-		lower_subject = subject.lower()
-		is_newsletter = any(k in lower_subject for k in ('newsletter', 'digest', 'weekly', 'daily'))
-		from_domain = from_.split('@')[-1].lower() if '@' in from_ else ''
-		is_vip = from_domain in vip_domains
+		_, at, domain = from_.rpartition('@')
+		# From is usually 'Name <user@domain>'; drop the closing bracket.
+		from_domain = domain.rstrip('> ').lower() if at else ''
 
-		if is_vip:
-			actions.append(
+		if from_domain in vip_domains:
+			append(
 				{
 					'id': f'star_{thread_id}',
 					'op': 'star',
@@ -96,13 +56,11 @@ def main() -> int:
 					'entities': [{'type': 'email_thread', 'id': thread_id, 'account': account}],
 					'summary': f'Star: {subject[:80]}',
 					'reasoning': f'From VIP domain: {from_domain}',
-					'ts': now_iso(),
+					'ts': ts,
 				},
 			)
-			continue
-
-		if is_newsletter:
-			actions.append(
+		elif newsletter_search(subject) is not None:
+			append(
 				{
 					'id': f'archive_{thread_id}',
 					'op': 'archive',
@@ -110,7 +68,7 @@ def main() -> int:
 					'entities': [{'type': 'email_thread', 'id': thread_id, 'account': account}],
 					'summary': f'Archive: {subject[:80]}',
 					'reasoning': 'Newsletter-like subject',
-					'ts': now_iso(),
+					'ts': ts,
 				},
 			)
 
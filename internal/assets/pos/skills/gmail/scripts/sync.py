@@ -1,56 +1,14 @@
 #!/usr/bin/env python3
 
-import json
 import os
-import re
 import subprocess
 import sys
+import tempfile
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Iterable
 
-
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
-
-
-def parse_frontmatter(md_path: str) -> dict[str, Any]:
-	# Minimal YAML-ish frontmatter parser (supports scalars + lists)
-	with open(md_path, 'r', encoding='utf-8') as f:
-		lines = f.read().splitlines()
-	if not lines or lines[0].strip() != '---':
-		return {}
-	data: dict[str, Any] = {}
-	i = 1
-	current_list_key: str | None = None
-	while i < len(lines):
-		line = lines[i]
-		i += 1
-		if line.strip() == '---':
-			break
-		if not line.strip() or line.lstrip().startswith('#'):
-			continue
-		if line.lstrip().startswith('- ') and current_list_key:
-			data.setdefault(current_list_key, []).append(line.strip()[2:])
-			continue
-		current_list_key = None
-		if ':' not in line:
-			continue
-		key, raw = line.split(':', 1)
-		key = key.strip()
-		raw = raw.strip()
-		if raw == '':
-			current_list_key = key
-			data[key] = []
-			continue
-		if raw.isdigit():
-			data[key] = int(raw)
-			continue
-		if raw.lower() in ('true', 'false'):
-			data[key] = raw.lower() == 'true'
-			continue
-		data[key] = raw
-	return data
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import emit, loads, parse_frontmatter, write_state_if_changed
 
 
 def try_parse_json(text: str) -> Any | None:
@@ -60,27 +18,63 @@ def try_parse_json(text: str) -> Any | None:
 	if not (text.startswith('{') or text.startswith('[')):
 		return None
 	try:
-		return json.loads(text)
+		return loads(text)
 	except Exception:
 		return None
 
 
-def parse_search_output(output: str) -> list[dict[str, Any]]:
+def threads_from_items(items: list[Any]) -> list[dict[str, Any]]:
+	threads: list[dict[str, Any]] = []
+	for item in items:
+		if not isinstance(item, dict):
+			continue
+		thread_id = item.get('threadId') or item.get('thread_id') or item.get('id')
+		if not thread_id:
+			continue
+		threads.append(
+			{
+				'id': str(thread_id),
+				'subject': item.get('subject') or item.get('title') or '',
+				'from': item.get('from') or item.get('sender') or '',
+				'date': item.get('date') or item.get('internalDate') or '',
+				'unread': True,
+				'inbox': True,
+			},
+		)
+	return threads
+
+
+def parse_gmcli_date(raw: str) -> str:
+	# gmcli date looks like: YYYY-MM-DD HH:MM. That exact shape is sliced by
+	# hand (strptime re-reads the format string on every call); anything else
+	# still goes through strptime, and unparseable values are returned as is.
+	try:
+		if len(raw) == 16 and raw[4] == '-' and raw[7] == '-' and raw[10] == ' ' and raw[13] == ':':
+			digits = raw[0:4] + raw[5:7] + raw[8:10] + raw[11:13] + raw[14:16]
+			if digits.isdigit() and digits.isascii():
+				dt = datetime(int(raw[0:4]), int(raw[5:7]), int(raw[8:10]), int(raw[11:13]), int(raw[14:16]), tzinfo=timezone.utc)
+				return dt.isoformat().replace('+00:00', 'Z')
+		dt = datetime.strptime(raw, '%Y-%m-%d %H:%M').replace(tzinfo=timezone.utc)
+		return dt.isoformat().replace('+00:00', 'Z')
+	except ValueError:
+		return raw
+
+
+def parse_search_output(lines: Iterable[str]) -> list[dict[str, Any]]:
 	# gmcli currently emits a tabular, tab-separated format:
 	# ID\tDATE\tFROM\tSUBJECT\tLABELS
-	# Parse that first (and ignore the header row).
+	# Parse that first (and ignore the header row). Rows are consumed as they
+	# arrive; only lines that are not rows are kept for the fallback parsers.
 	threads: list[dict[str, Any]] = []
-	for raw in output.splitlines():
+	rest: list[str] = []
+	for raw in lines:
 		line = raw.strip()
-		if not line:
-			continue
-		if line.startswith('ID\t') or line == 'ID' or line.startswith('ID '):
-			continue
-		if line.startswith('Total:'):
+		if not line or line.startswith('ID\t') or line == 'ID' or line.startswith('ID ') or line.startswith('Total:'):
+			rest.append(raw)
 			continue
 
-		cols = [c.strip() for c in re.split(r'\t+', raw) if c.strip()]
-		if len(cols) >= 4:
+		cols = [c.strip() for c in raw.split('\t')]
+		if len(cols) >= 4 and cols[0]:
 			thread_id = cols[0]
 			date_raw = cols[1]
 			from_ = cols[2]
@@ -88,13 +82,7 @@ def parse_search_output(output: str) -> list[dict[str, Any]]:
 			labels_raw = cols[4] if len(cols) >= 5 else ''
 			labels = [l for l in (labels_raw.split(',') if labels_raw else []) if l]
 
-			# gmcli date looks like: YYYY-MM-DD HH:MM
-			date_iso = ''
-			try:
-				dt = datetime.strptime(date_raw, '%Y-%m-%d %H:%M').replace(tzinfo=timezone.utc)
-				date_iso = dt.isoformat().replace('+00:00', 'Z')
-			except Exception:
-				date_iso = date_raw
+			date_iso = parse_gmcli_date(date_raw)
 
 			threads.append(
 				{
@@ -109,34 +97,17 @@ def parse_search_output(output: str) -> list[dict[str, Any]]:
 				},
 			)
 			continue
+		rest.append(raw)
 
 	if threads:
 		return threads
 
+	output = ''.join(rest)
 	parsed = try_parse_json(output)
-	if isinstance(parsed, list):
-		for item in parsed:
-			if not isinstance(item, dict):
-				continue
-			thread_id = item.get('threadId') or item.get('thread_id') or item.get('id')
-			if not thread_id:
-				continue
-			threads.append(
-				{
-					'id': str(thread_id),
-					'subject': item.get('subject') or item.get('title') or '',
-					'from': item.get('from') or item.get('sender') or '',
-					'date': item.get('date') or item.get('internalDate') or '',
-					'unread': True,
-					'inbox': True,
-				},
-			)
-		return threads
-
 	if isinstance(parsed, dict):
-		items = parsed.get('threads') or parsed.get('results') or parsed.get('messages')
-		if isinstance(items, list):
-			return parse_search_output(json.dumps(items))
+		parsed = parsed.get('threads') or parsed.get('results') or parsed.get('messages')
+	if isinstance(parsed, list):
+		return threads_from_items(parsed)
 
 	for line in output.splitlines():
 		line = line.strip()
@@ -173,13 +144,26 @@ def parse_search_output(output: str) -> list[dict[str, Any]]:
 	return threads
 
 
+def search_threads(argv: list[str]) -> tuple[int, list[dict[str, Any]], str]:
+	# Parse gmcli's stdout while it is still running instead of capturing it
+	# whole. stderr goes to a temp file so it cannot block stdout.
+	with tempfile.TemporaryFile() as err:
+		with subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=err, text=True, close_fds=False) as proc:
+			assert proc.stdout is not None
+			threads = parse_search_output(proc.stdout)
+			returncode = proc.wait()
+		err.seek(0)
+		stderr = err.read().decode('utf-8', errors='replace')
+	return returncode, threads, stderr
+
+
 def main() -> int:
 	pos_dir = os.environ.get('POS_DIR')
 	if not pos_dir:
 		emit({'type': 'error', 'message': 'POS_DIR not set'})
 		return 1
 
-	skill_md = os.path.join(pos_dir, 'skills', 'gmail', 'SKILL.md')
+	skill_md = f'{pos_dir}/skills/gmail/SKILL.md'
 	prefs = parse_frontmatter(skill_md)
 	accounts = prefs.get('accounts') or []
 	max_threads = int(prefs.get('max_threads') or 50)
@@ -203,37 +187,29 @@ def main() -> int:
 		pct = 0.1 + 0.7 * (idx / max(len(accounts), 1))
 		emit({'type': 'progress', 'message': f'gmcli search {account} "{query}"', 'pct': pct})
 		try:
-			proc = subprocess.run(
-				['gmcli', account, 'search', query, '--max', str(max_threads)],
-				check=True,
-				capture_output=True,
-				text=True,
-			)
+			returncode, threads, stderr = search_threads(['gmcli', account, 'search', query, '--max', str(max_threads)])
 		except FileNotFoundError:
 			emit({'type': 'error', 'message': 'gmcli not found in PATH'})
 			return 1
-		except subprocess.CalledProcessError as e:
+		if returncode != 0:
 			emit(
 				{
 					'type': 'error',
 					'message': 'gmcli search failed',
 					'details': {
 						'account': account,
-						'code': e.returncode,
-						'stderr': (e.stderr or '').strip(),
+						'code': returncode,
+						'stderr': stderr.strip(),
 					},
 				},
 			)
 			return 1
 
-		threads = parse_search_output(proc.stdout)
 		for t in threads:
 			t['account'] = account
 		all_threads.extend(threads)
 		per_account[account] = len(threads)
-	last_sync = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
 	state = {
-		'last_sync': last_sync,
 		'accounts': accounts,
 		'threads': all_threads,
 		'stats': {
@@ -243,11 +219,9 @@ def main() -> int:
 		},
 	}
 
-	os.makedirs(os.path.join(pos_dir, 'STATE'), exist_ok=True)
-	state_path = os.path.join(pos_dir, 'STATE', 'gmail.json')
-	with open(state_path, 'w', encoding='utf-8') as f:
-		json.dump(state, f, indent=2, ensure_ascii=False)
-		f.write('\n')
+	os.makedirs(f'{pos_dir}/STATE', exist_ok=True)
+	state_path = f'{pos_dir}/STATE/gmail.json'
+	write_state_if_changed(state_path, state)
 
 	emit({'type': 'artifact', 'path': 'STATE/gmail.json', 'description': 'Updated gmail index state'})
 	emit({'type': 'result', 'ok': True, 'data': {'threads': len(all_threads), 'accounts': accounts}})
@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 
-import json
 import os
-import subprocess
+import shutil
 import sys
 from typing import Any
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import apply_workers, emit, loads
 
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
+
+def update_status(node: str, status_js: str, vendor_dir: str, action_id: Any, issue_id: str, state_id: str) -> dict[str, Any]:
+	import subprocess
+
+	try:
+		proc = subprocess.run(
+			[node, status_js, issue_id, state_id],
+			check=True,
+			capture_output=True,
+			text=True,
+			cwd=vendor_dir,
+		)
+		return {'ok': True, 'action': action_id, 'stdout': proc.stdout.strip()}
+	except subprocess.CalledProcessError as e:
+		return {
+			'ok': False,
+			'action': action_id,
+			'error': (e.stderr or '').strip() or 'status.js failed',
+			'code': e.returncode,
+		}
 
 
 def main() -> int:
@@ -19,8 +37,10 @@ def main() -> int:
 		return 1
 
 	try:
-		payload = json.load(sys.stdin)
+		payload = loads(sys.stdin.buffer.read())
 	except Exception:
+		payload = None
+	if not isinstance(payload, dict):
 		emit({'type': 'error', 'message': 'Expected JSON on stdin'})
 		return 1
 
@@ -28,17 +48,31 @@ def main() -> int:
 	if not isinstance(actions, list):
 		emit({'type': 'error', 'message': 'proposed_actions must be a list'})
 		return 1
+	if not actions:
+		emit({'type': 'result', 'ok': True, 'data': {'results': []}})
+		return 0
 
-	vendor_dir = os.path.join(pos_dir, 'skills', 'linear', 'vendor')
-	status_js = os.path.join(vendor_dir, 'status.js')
+	vendor_dir = f'{pos_dir}/skills/linear/vendor'
+	status_js = f'{vendor_dir}/status.js'
 	if not os.path.exists(status_js):
 		emit({'type': 'error', 'message': 'linear vendor/status.js not found'})
 		return 1
 
+	node = shutil.which('node')
+	if node is None:
+		emit({'type': 'error', 'message': 'node not found in PATH'})
+		return 1
+
+	from concurrent.futures import ThreadPoolExecutor, as_completed
+
 	emit({'type': 'progress', 'message': f'Applying {len(actions)} actions...', 'pct': 0.1})
 
-	results: list[dict[str, Any]] = []
-	for idx, action in enumerate(actions):
+	# Validate up front, then run the status.js calls in parallel; each one is
+	# a separate node process waiting on the Linear API. Results keep the order
+	# of the actions.
+	results: list[dict[str, Any] | None] = []
+	jobs: list[tuple[int, Any, str, str]] = []
+	for action in actions:
 		if not isinstance(action, dict):
 			continue
 		op = action.get('op')
@@ -55,25 +89,20 @@ def main() -> int:
 		if not issue_id or not state_id:
 			results.append({'ok': False, 'error': 'missing issue id or state_id', 'action': action.get('id')})
 			continue
-		try:
-			proc = subprocess.run(
-				['node', status_js, str(issue_id), str(state_id)],
-				check=True,
-				capture_output=True,
-				text=True,
-				cwd=vendor_dir,
-			)
-			results.append({'ok': True, 'action': action.get('id'), 'stdout': proc.stdout.strip()})
-		except subprocess.CalledProcessError as e:
-			results.append(
-				{
-					'ok': False,
-					'action': action.get('id'),
-					'error': (e.stderr or '').strip() or 'status.js failed',
-					'code': e.returncode,
-				},
-			)
-		emit({'type': 'progress', 'message': f'{idx + 1}/{len(actions)} done', 'pct': 0.1 + 0.9 * ((idx + 1) / max(len(actions), 1))})
+		jobs.append((len(results), action.get('id'), str(issue_id), str(state_id)))
+		results.append(None)
+
+	with ThreadPoolExecutor(max_workers=apply_workers(len(jobs))) as executor:
+		futures = {
+			executor.submit(update_status, node, status_js, vendor_dir, action_id, issue_id, state_id): slot
+			for slot, action_id, issue_id, state_id in jobs
+		}
+		# About 20 progress events however many jobs there are.
+		progress_every = max(1, len(jobs) // 20)
+		for done, future in enumerate(as_completed(futures), start=1):
+			results[futures[future]] = future.result()
+			if done % progress_every == 0 or done == len(jobs):
+				emit({'type': 'progress', 'message': f'{done}/{len(jobs)} done', 'pct': 0.1 + 0.9 * (done / len(jobs))})
 
 	emit({'type': 'result', 'ok': True, 'data': {'results': results}})
 	return 0
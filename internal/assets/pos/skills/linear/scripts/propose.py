@@ -1,22 +1,10 @@
 #!/usr/bin/env python3
 
-import json
 import os
 import sys
-from typing import Any
 
-
-def emit(event: dict[str, Any]) -> None:
-	print(json.dumps(event, ensure_ascii=False))
-	sys.stdout.flush()
-
-
-def load_state(path: str) -> dict[str, Any]:
-	try:
-		with open(path, 'r', encoding='utf-8') as f:
-			return json.load(f)
-	except FileNotFoundError:
-		return {}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pos_common import emit, load_state
 
 
 def main() -> int:
@@ -25,7 +13,7 @@ def main() -> int:
 		emit({'type': 'error', 'message': 'POS_DIR not set'})
 		return 1
 
-	state = load_state(os.path.join(pos_dir, 'STATE', 'linear.json'))
+	state = load_state(f'{pos_dir}/STATE/linear.json')
 	issues = state.get('issues') or []
 	emit({'type': 'progress', 'message': f'Loaded {len(issues)} issues', 'pct': 0.5})
 
@@ -0,0 +1,269 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+	import subprocess
+
+# Shared by the skill scripts; each script puts this directory on sys.path.
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+# orjson is optional; when present it backs the hot JSON paths (emit, state
+# files, CLI output). Both variants produce compact UTF-8 bytes.
+if orjson is not None:
+	loads = orjson.loads
+
+	def dumps(obj: Any) -> bytes:
+		return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+else:
+	loads = json.loads
+
+	def dumps(obj: Any) -> bytes:
+		return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# Every line that is not blank or a # comment: a list item, a key (everything
+# before the first ':') or anything else, which ends the current list.
+_FM_LINE_RE = re.compile(rb'^[ \t]*(?=[^\s#])(?:-[ \t]+(.*)|([^:\n]*):(.*)|.*)$', re.M)
+_FM_CLOSE_RE = re.compile(rb'^[^\S\n]*---[^\S\n]*$', re.M)
+
+
+def parse_frontmatter(md_path: str) -> dict[str, Any]:
+	# Memoized on (path, mtime, size): repeat calls from a long-lived process
+	# cost one stat. The returned dict is shared between callers; treat it as
+	# read-only.
+	st = os.stat(md_path)
+	return _parse_frontmatter(md_path, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_frontmatter(md_path: str, mtime_ns: int, size: int) -> dict[str, Any]:
+	return _read_frontmatter(md_path)
+
+
+def _frontmatter_block(md_path: str) -> bytes | None:
+	# Reads 64 KiB at a time only until the closing --- line, so the document
+	# body is normally never loaded. None means there is no frontmatter.
+	fd = os.open(md_path, os.O_RDONLY)
+	try:
+		buf = b''
+		start = -1
+		eof = False
+		while True:
+			if start < 0:
+				nl = buf.find(b'\n')
+				if nl >= 0 or eof:
+					if (buf if nl < 0 else buf[:nl]).strip() != b'---':
+						return None
+					start = len(buf) if nl < 0 else nl + 1
+			if start >= 0:
+				m = _FM_CLOSE_RE.search(buf, start)
+				# A match on the last, unterminated line may still grow.
+				if m is not None and (eof or m.end() < len(buf)):
+					return buf[start : m.start()]
+				if eof:
+					return buf[start:]
+			chunk = os.read(fd, 65536)
+			eof = not chunk
+			buf += chunk
+	finally:
+		os.close(fd)
+
+
+def _read_frontmatter(md_path: str) -> dict[str, Any]:
+	# Minimal YAML-ish frontmatter parser (supports scalars + lists). Works on
+	# raw bytes and only decodes the keys and values it keeps.
+	block = _frontmatter_block(md_path)
+	if block is None:
+		return {}
+	data: dict[str, Any] = {}
+	current_list_key: str | None = None
+	for m in _FM_LINE_RE.finditer(block):
+		item_b, key_b, raw_b = m.groups()
+		if item_b is not None:
+			if current_list_key:
+				data[current_list_key].append(item_b.strip().decode('utf-8'))
+				continue
+			key_b, sep, raw_b = m.group().partition(b':')
+			if not sep:
+				key_b = None
+		current_list_key = None
+		if key_b is None:
+			continue
+		key = key_b.strip().decode('utf-8')
+		raw_b = raw_b.strip()
+		if raw_b == b'':
+			current_list_key = key
+			data[key] = []
+			continue
+		if raw_b.isdigit():
+			data[key] = int(raw_b)
+			continue
+		if raw_b.lower() in (b'true', b'false'):
+			data[key] = raw_b.lower() == b'true'
+			continue
+		data[key] = raw_b.decode('utf-8')
+	return data
+
+
+# Events go straight to the binary stdout buffer and are flushed one by one,
+# so the runner sees each line as soon as it is written.
+_EMIT_STREAM_ACTIONS = 500
+_emit_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def emit(event: dict[str, Any]) -> None:
+	out = sys.stdout.buffer
+	data = event.get('data')
+	if orjson is None and isinstance(data, dict) and len(data.get('proposed_actions') or ()) > _EMIT_STREAM_ACTIONS:
+		# Without orjson, large propose results are encoded piecewise into the
+		# stdout buffer instead of being built up as one string first.
+		for chunk in _emit_encoder.iterencode(event):
+			out.write(chunk.encode('utf-8'))
+	else:
+		out.write(dumps(event))
+	out.write(b'\n')
+	out.flush()
+
+
+def run_cmd(argv: list[str], **kwargs: Any) -> 'subprocess.CompletedProcess[str]':
+	# close_fds=False lets CPython take the posix_spawn/vfork fast path and skip
+	# the descriptor sweep (descriptors Python opens are non-inheritable anyway).
+	# The environment is inherited: gh and gccli need HOME, XDG_* and keyring
+	# variables to find their credentials. subprocess is imported on first use
+	# so scripts that never spawn anything do not pay for it.
+	import subprocess
+
+	return subprocess.run(argv, capture_output=True, text=True, close_fds=False, **kwargs)
+
+
+def apply_workers(jobs: int) -> int:
+	# Thread count for apply scripts: POS_APPLY_CONCURRENCY (default 8), never
+	# more than there are jobs.
+	try:
+		limit = int(os.environ.get('POS_APPLY_CONCURRENCY') or 8)
+	except ValueError:
+		limit = 8
+	return max(1, min(limit, jobs))
+
+
+def load_state(path: str) -> dict[str, Any]:
+	try:
+		with open(path, 'rb') as f:
+			return loads(f.read())
+	except FileNotFoundError:
+		return {}
+
+
+def now_iso() -> str:
+	return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def write_state_atomic(path: str, state: dict[str, Any]) -> None:
+	# Stream compact JSON one top-level key (and one list element) at a time so
+	# the large arrays are never encoded into a single in-memory string. The file
+	# is written beside the target and renamed over it, so readers never see a
+	# partially written state.
+	tmp = path + '.tmp'
+	try:
+		with open(tmp, 'wb') as f:
+			f.write(b'{')
+			sep = b''
+			for key, value in state.items():
+				f.write(sep)
+				f.write(dumps(key))
+				f.write(b':')
+				if isinstance(value, list):
+					f.write(b'[')
+					for i, item in enumerate(value):
+						if i:
+							f.write(b',')
+						f.write(dumps(item))
+					f.write(b']')
+				else:
+					f.write(dumps(value))
+				sep = b','
+			f.write(b'}\n')
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp, path)
+	except BaseException:
+		try:
+			os.unlink(tmp)
+		except OSError:
+			pass
+		raise
+
+
+def write_state_if_changed(path: str, state: dict[str, Any]) -> bool:
+	# Rewrites a STATE file only when the encoded state differs from what is on
+	# disk; otherwise the file is only touched. The state carries no per-run
+	# timestamp, so the file's mtime is the time of the last sync.
+	# Compact unless POS_PRETTY is set for hand inspection.
+	if os.environ.get('POS_PRETTY'):
+		payload = (json.dumps(state, indent=2, ensure_ascii=False) + '\n').encode('utf-8')
+	else:
+		payload = dumps(state) + b'\n'
+	try:
+		if os.stat(path).st_size == len(payload):
+			with open(path, 'rb') as f:
+				if f.read() == payload:
+					os.utime(path)
+					return False
+	except OSError:
+		pass
+
+	tmp = path + '.tmp'
+	try:
+		fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+		try:
+			view = memoryview(payload)
+			while view:
+				view = view[os.write(fd, view) :]
+		finally:
+			os.close(fd)
+		os.replace(tmp, path)
+	except BaseException:
+		try:
+			os.unlink(tmp)
+		except OSError:
+			pass
+		raise
+	return True
+
+
+def config_signature(*parts: Any) -> str:
+	# Stable across processes (unlike hash()), so it can be stored in state.
+	return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def fresh_state(state_path: str, sig: str, ttl_seconds: int) -> dict[str, Any] | None:
+	# Returns the previous state if it was written for the same configuration
+	# signature less than ttl_seconds ago; None otherwise (or when ttl is 0).
+	if ttl_seconds <= 0:
+		return None
+	try:
+		with open(state_path, 'rb') as f:
+			state = loads(f.read())
+	except (OSError, ValueError):
+		return None
+	if not isinstance(state, dict) or state.get('_sig') != sig:
+		return None
+	try:
+		last_sync = datetime.fromisoformat(str(state.get('last_sync') or '').replace('Z', '+00:00'))
+	except ValueError:
+		return None
+	age = (datetime.now(timezone.utc) - last_sync).total_seconds()
+	if 0 <= age < ttl_seconds:
+		return state
+	return None